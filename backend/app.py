@@ -13,7 +13,11 @@ import io
 from supabase import create_client
 import uuid
 import math
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+import prefilter
+from geocoder import Geocoder, RateLimited
+import threading
 
 SUPABASE_URL = os.getenv("VITE_SUPABASE_URL")
 SUPABASE_KEY = os.getenv("VITE_SUPABASE_SERVICE")
@@ -23,6 +27,9 @@ supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 app = Flask(__name__)
 CORS(app)
 
+# Shared, persistent geocoding cache in front of Nominatim
+geocoder = Geocoder()
+
 # Load model once at startup
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_PATH = os.path.join(BASE_DIR, "models", "pothole_detector.h5")
@@ -32,6 +39,27 @@ print("[*] Model loaded successfully")
 
 IMG_SIZE = 128
 
+# gunicorn runs several threads per worker; only one request at a time may
+# hold the model / OpenCV working set to stay within the memory budget.
+predict_lock = threading.Lock()
+
+# Early-exit cascade in front of model.predict (see prefilter.py)
+PREFILTER_CONFIG = prefilter.load_config()
+print(f"[*] Prefilter mode: {PREFILTER_CONFIG['mode']}")
+
+# Stored image derivatives: longest edge (px) × format.
+# List views and popups pick the smallest one that fits instead of the full image.
+VARIANT_SIZES = (800, 320, 96)
+VARIANT_FORMATS = {
+    "jpg":  ("JPEG", "image/jpeg", {"quality": 80, "optimize": True}),
+    "webp": ("WEBP", "image/webp", {"quality": 75, "method": 4}),
+}
+PRIMARY_VARIANT = (800, "jpg")  # kept in image_url for older clients
+
+# Encoding and uploading run here so they overlap with the severity analysis
+image_executor = ThreadPoolExecutor(max_workers=4)
+# Waits on finished uploads, then records them on the row or removes them
+variant_executor = ThreadPoolExecutor(max_workers=1)
 
 def preprocess_image(img):
     img = img.resize((IMG_SIZE, IMG_SIZE))
@@ -40,6 +68,80 @@ def preprocess_image(img):
     return img
 
 
+def build_image_variants(img):
+    """Downscale the (already ≤800px) image once per size, largest first."""
+    variants = {}
+    current = img
+    for size in VARIANT_SIZES:
+        if max(current.size) > size:
+            current = current.copy()
+            current.thumbnail((size, size), Image.LANCZOS)
+        variants[size] = current
+    return variants
+
+
+def upload_image_variant(img, path, fmt):
+    """
+    Encode one derivative and upload it to Supabase storage.
+    `img` must be a copy owned by this task — Image.save is not thread-safe.
+    """
+    pil_format, content_type, options = VARIANT_FORMATS[fmt]
+    buffer = io.BytesIO()
+    img.save(buffer, format=pil_format, **options)
+
+    supabase.storage.from_("Potholes").upload(
+        path,
+        buffer.getvalue(),
+        {"content-type": content_type}
+    )
+    return path
+
+
+def finish_image_variants(uploads, pothole_id, image_variants):
+    """
+    Wait for the derivative uploads of one report, keyed by (size, fmt).
+    If the report was stored, record every variant that uploaded on its row;
+    otherwise cancel what has not started and remove what was already uploaded.
+    """
+    uploaded = {}
+    for (size, fmt), future in uploads.items():
+        if pothole_id is None and future.cancel():
+            continue
+        try:
+            uploaded[(size, fmt)] = future.result()
+        except Exception as e:
+            print(f"[ERROR] Image variant upload failed ({size}px {fmt}): {e}")
+
+    if pothole_id is None:
+        orphans = list(uploaded.values())
+        if orphans:
+            try:
+                supabase.storage.from_("Potholes").remove(orphans)
+            except Exception as e:
+                print(f"[ERROR] Could not remove orphaned images {orphans}: {e}")
+        return
+
+    image_variants = {size: dict(urls) for size, urls in image_variants.items()}
+    for (size, fmt), path in uploaded.items():
+        image_variants.setdefault(str(size), {})[fmt] = supabase.storage.from_("Potholes").get_public_url(path)
+    try:
+        supabase.table("potholes").update({"image_variants": image_variants}).eq("id", pothole_id).execute()
+    except Exception as e:
+        print(f"[ERROR] Could not record image variants for {pothole_id}: {e}")
+
+
+def insert_pothole(row):
+    """Insert a pothole row, falling back to the schema without image_variants."""
+    try:
+        return supabase.table("potholes").insert(row).execute()
+    except Exception as e:
+        if "image_variants" not in str(e):
+            raise
+        print("[!] potholes.image_variants column missing — run the migration in SETUP.md")
+        row = {k: v for k, v in row.items() if k != "image_variants"}
+        return supabase.table("potholes").insert(row).execute()
+
+
 def _default_params():
     return {
         "relative_area": 0, "depth_score": 0,
@@ -175,6 +277,12 @@ def home():
 
 @app.route("/predict", methods=["POST"])
 def predict():
+    # Serialize per worker so concurrent uploads don't each hold TF/OpenCV memory
+    with predict_lock:
+        return _predict()
+
+
+def _predict():
     print("[*] Received prediction request")
     try:
         if "image" not in request.files:
@@ -200,6 +308,19 @@ def predict():
         if max(img.size) > MAX_DIM:
             img.thumbnail((MAX_DIM, MAX_DIM), Image.LANCZOS)
 
+        # ====== CHEAP PRE-FILTER ======
+        # Reject blurry / dark / clearly non-road images before the CNN
+        rejected, reason, _ = prefilter.check_image(img, PREFILTER_CONFIG)
+        if reason:
+            print(f"[*] Prefilter ({PREFILTER_CONFIG['mode']}): {reason}")
+        if rejected:
+            # The model never ran, so there is no confidence to report
+            return jsonify({
+                "error": "Image rejected before analysis — please retake a clear photo of the road",
+                "result": "Rejected",
+                "prefilter": reason
+            }), 422
+
         processed = preprocess_image(img)
 
         prediction = model.predict(processed)[0][0]
@@ -216,44 +337,56 @@ def predict():
                 "confidence": confidence
             })
 
-        # ====== ADVANCED SEVERITY ANALYSIS ======
-        print("[*] Starting severity analysis...")
-        # Convert the already-resized PIL image to OpenCV format
-        img_cv = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
-
-        severity, severity_metrics = extract_and_analyze_pothole(img_cv)
-        print(f"[*] Severity: {severity}")
-
-        # ====== UPLOAD IMAGE TO SUPABASE STORAGE ======
-        # Re-encode the resized image to save bandwidth on Supabase upload too
-        upload_buffer = io.BytesIO()
-        img.save(upload_buffer, format="JPEG", quality=80)
-        upload_bytes = upload_buffer.getvalue()
-
-        filename = f"{user_id}/{uuid.uuid4()}.jpg"
-        print(f"[*] Uploading to Supabase: {filename}")
-
-        supabase.storage.from_("Potholes").upload(
-            filename,
-            upload_bytes,
-            {"content-type": "image/jpeg"}
-        )
-
-        public_url = supabase.storage.from_("Potholes").get_public_url(filename)
-
-        # ====== INSERT INTO DATABASE ======
-        print("[*] Inserting into database...")
-        supabase.table("potholes").insert({
-            "user_id": user_id,
-            "latitude": float(latitude),
-            "longitude": float(longitude),
-            "severity": severity,
-            "image_url": public_url,
-            "description": description,
-            "confidence": confidence,
-            "verified": False,
-            "status": "active"
-        }).execute()
+        # ====== UPLOAD IMAGE DERIVATIVES TO SUPABASE STORAGE ======
+        # Encode and upload every size in the background so the work
+        # overlaps with the OpenCV analysis below.
+        base_path = f"{user_id}/{uuid.uuid4()}"
+        variants = build_image_variants(img)
+        print(f"[*] Uploading {len(VARIANT_SIZES) * len(VARIANT_FORMATS)} image variants: {base_path}")
+
+        # One task per size and format, each with its own copy of the image
+        uploads = {
+            (size, fmt): image_executor.submit(upload_image_variant, variant.copy(), f"{base_path}_{size}.{fmt}", fmt)
+            for size, variant in variants.items()
+            for fmt in VARIANT_FORMATS
+        }
+        image_variants = {}
+        pothole_id = None
+
+        try:
+            # ====== ADVANCED SEVERITY ANALYSIS ======
+            print("[*] Starting severity analysis...")
+            # Convert the already-resized PIL image to OpenCV format
+            img_cv = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
+
+            severity, severity_metrics = extract_and_analyze_pothole(img_cv)
+            print(f"[*] Severity: {severity}")
+
+            # Only the primary JPEG must exist before the row is inserted;
+            # every other variant is recorded once it finishes.
+            primary_size, primary_fmt = PRIMARY_VARIANT
+            primary_path = uploads[PRIMARY_VARIANT].result()
+            public_url = supabase.storage.from_("Potholes").get_public_url(primary_path)
+            image_variants[str(primary_size)] = {primary_fmt: public_url}
+
+            # ====== INSERT INTO DATABASE ======
+            print("[*] Inserting into database...")
+            inserted = insert_pothole({
+                "user_id": user_id,
+                "latitude": float(latitude),
+                "longitude": float(longitude),
+                "severity": severity,
+                "image_url": public_url,
+                "image_variants": image_variants,
+                "description": description,
+                "confidence": confidence,
+                "verified": False,
+                "status": "active"
+            })
+            pothole_id = inserted.data[0]["id"]
+        finally:
+            # Record the remaining variants, or clean everything up on failure
+            variant_executor.submit(finish_image_variants, uploads, pothole_id, image_variants)
 
         # ====== Increment contributions ======
         supabase.rpc("increment_contributions", {"user_id": user_id}).execute()
@@ -440,5 +573,54 @@ def get_pothole_status(pothole_id):
         return jsonify({"error": str(e)}), 500
 
 
+# ─────────────────────────────── GEOCODING PROXY ─────────────────────────────
+
+@app.route("/geocode", methods=["GET"])
+def geocode_search():
+    """
+    Forward geocode through the shared cache.
+    Query params: q
+    Returns Nominatim's search JSON (list, best match first).
+    """
+    try:
+        query = (request.args.get("q") or "").strip()
+        if not query:
+            return jsonify({"error": "q is required"}), 400
+
+        return jsonify(geocoder.search(query))
+
+    except RateLimited as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": str(e.retry_after)}
+    except Exception as e:
+        return jsonify({"error": str(e)}), 502
+
+
+@app.route("/geocode/reverse", methods=["GET"])
+def geocode_reverse():
+    """
+    Reverse geocode through the shared cache (coordinates rounded to ~110 m).
+    Query params: lat, lng
+    Returns Nominatim's reverse JSON (with address details).
+    """
+    try:
+        lat = request.args.get("lat")
+        lng = request.args.get("lng")
+
+        if not lat or not lng:
+            return jsonify({"error": "lat and lng are required"}), 400
+
+        try:
+            lat, lng = float(lat), float(lng)
+        except ValueError:
+            return jsonify({"error": "lat and lng must be numbers"}), 400
+
+        return jsonify(geocoder.reverse(lat, lng))
+
+    except RateLimited as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": str(e.retry_after)}
+    except Exception as e:
+        return jsonify({"error": str(e)}), 502
+
+
 if __name__ == "__main__":
     app.run(debug=True, host='0.0.0.0', port=8000)
@@ -0,0 +1,195 @@
+"""
+Calibrate the pre-filter cascade (prefilter.py) on a labelled sample.
+
+Expected layout:
+    <sample_dir>/road/   → images that must reach the CNN (potholes and plain road)
+    <sample_dir>/other/  → images that should be rejected (selfies, dark, blurry, ...)
+
+Usage:
+    python calibrate_prefilter.py <sample_dir>
+    python calibrate_prefilter.py <sample_dir> --fit prefilter_weights.json
+    python calibrate_prefilter.py <sample_dir> --model models/pothole_detector.h5
+
+Reports the false-reject rate (road images the cascade would drop), the
+reject rate on non-road images, a per-rule breakdown and the CPU cost of
+the feature extraction. Thresholds are read from the same PREFILTER_* env
+vars the API uses, so a run reflects exactly what enforce mode would do.
+
+With --fit, the rates are measured by k-fold cross-validation (the
+classifier never scores images it was trained on) before the final
+weights are fitted on the whole sample. With --model, the CNN's CPU time
+per image is measured too, giving a before/after CPU-per-request estimate.
+"""
+import os
+import sys
+import json
+import copy
+import time
+import argparse
+
+import numpy as np
+from PIL import Image
+
+import prefilter
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+
+def load_images(folder):
+    if not os.path.isdir(folder):
+        sys.exit(f"Missing folder: {folder}")
+    return [
+        Image.open(os.path.join(folder, name)).convert("RGB")
+        for name in sorted(os.listdir(folder))
+        if name.lower().endswith(IMAGE_EXTS)
+    ]
+
+
+def load_features(images):
+    """Returns (features, CPU seconds spent extracting them)."""
+    start = time.process_time()
+    features = [prefilter.extract_features(img) for img in images]
+    return features, time.process_time() - start
+
+
+def fit_classifier(road, other, epochs=2000, lr=0.1, l2=1e-3):
+    """Plain logistic regression (label 1 = road) trained with gradient descent."""
+    rows = road + other
+    X = np.array([[f[n] for n in prefilter.FEATURE_NAMES] for f in rows], dtype=np.float64)
+    y = np.array([1.0] * len(road) + [0.0] * len(other))
+
+    mean = X.mean(axis=0)
+    std = X.std(axis=0) + 1e-8
+    Xn = (X - mean) / std
+
+    w = np.zeros(Xn.shape[1])
+    b = 0.0
+    for _ in range(epochs):
+        p = 1.0 / (1.0 + np.exp(-(Xn @ w + b)))
+        grad = p - y
+        w -= lr * (Xn.T @ grad / len(y) + l2 * w)
+        b -= lr * grad.mean()
+
+    return {
+        "features": list(prefilter.FEATURE_NAMES),
+        "mean": mean.tolist(),
+        "std": std.tolist(),
+        "weights": w.tolist(),
+        "bias": float(b),
+    }
+
+
+def reject_counts(features, config):
+    reasons = {}
+    for f in features:
+        rejected, reason = prefilter.evaluate(f, config)
+        if rejected:
+            reasons[reason] = reasons.get(reason, 0) + 1
+    return reasons
+
+
+def cross_validate(road, other, config, folds):
+    """Out-of-fold reject counts for road and other with a per-fold classifier."""
+    rng = np.random.default_rng(0)
+    road_fold = rng.permutation(len(road)) % folds
+    other_fold = rng.permutation(len(other)) % folds
+
+    road_reasons, other_reasons = {}, {}
+    for k in range(folds):
+        train_road = [f for f, i in zip(road, road_fold) if i != k]
+        train_other = [f for f, i in zip(other, other_fold) if i != k]
+        fold_config = copy.deepcopy(config)
+        fold_config["classifier"] = fit_classifier(train_road, train_other)
+
+        for held_out, fold_of, totals in ((road, road_fold, road_reasons), (other, other_fold, other_reasons)):
+            test = [f for f, i in zip(held_out, fold_of) if i == k]
+            for reason, count in reject_counts(test, fold_config).items():
+                totals[reason] = totals.get(reason, 0) + count
+    return road_reasons, other_reasons
+
+
+def report(label, reasons, total):
+    rejected = sum(reasons.values())
+    rate = rejected / total if total else 0.0
+    print(f"  {label:<6}: {rejected}/{total} rejected ({rate:.2%})")
+    for reason, count in sorted(reasons.items(), key=lambda kv: -kv[1]):
+        print(f"           {reason:<14} {count}")
+    return rate
+
+
+def cnn_cpu_per_image(model_path, images):
+    """CPU seconds per image for the 128×128 CNN forward pass used by /predict."""
+    from tensorflow.keras.models import load_model
+    model = load_model(model_path)
+    batch = [np.expand_dims(np.array(img.resize((128, 128))) / 255.0, axis=0) for img in images]
+    model.predict(batch[0], verbose=0)  # warm-up
+    start = time.process_time()
+    for x in batch:
+        model.predict(x, verbose=0)
+    return (time.process_time() - start) / len(batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sample_dir")
+    parser.add_argument("--fit", metavar="OUT_JSON",
+                        help="fit the optional linear classifier and write its weights here")
+    parser.add_argument("--folds", type=int, default=5,
+                        help="cross-validation folds used with --fit (default 5)")
+    parser.add_argument("--model", metavar="H5",
+                        help="also measure the CNN's CPU time for a before/after estimate")
+    args = parser.parse_args()
+
+    road_images = load_images(os.path.join(args.sample_dir, "road"))
+    other_images = load_images(os.path.join(args.sample_dir, "other"))
+    if not road_images or not other_images:
+        sys.exit("Need images in both road/ and other/")
+    if args.fit and min(len(road_images), len(other_images)) < args.folds:
+        sys.exit(f"--fit needs at least {args.folds} images in each folder")
+
+    road, road_cpu = load_features(road_images)
+    other, other_cpu = load_features(other_images)
+    n = len(road) + len(other)
+
+    config = prefilter.load_config()
+    if args.fit:
+        road_reasons, other_reasons = cross_validate(road, other, config, args.folds)
+        config["classifier"] = fit_classifier(road, other)
+        with open(args.fit, "w") as f:
+            json.dump(config["classifier"], f, indent=2)
+        print(f"[*] Classifier weights written to {args.fit} (set PREFILTER_WEIGHTS to use them)")
+    else:
+        road_reasons, other_reasons = reject_counts(road, config), reject_counts(other, config)
+
+    print("=" * 50)
+    print("         PRE-FILTER CALIBRATION")
+    print("=" * 50)
+    if args.fit:
+        print(f"  Rates below are {args.folds}-fold cross-validated")
+    frr = report("road", road_reasons, len(road))
+    tnr = report("other", other_reasons, len(other))
+    print("-" * 50)
+    print(f"  FALSE-REJECT RATE : {frr:.2%}   (road images lost before the CNN)")
+    print(f"  NON-ROAD REJECTED : {tnr:.2%}   (CNN + OpenCV passes saved)")
+
+    prefilter_cpu = (road_cpu + other_cpu) / n
+    print(f"  Pre-filter CPU    : {prefilter_cpu * 1000:.2f} ms / image")
+    if args.model:
+        # Weighted by this sample's road/other mix; OpenCV savings come on top
+        cnn_cpu = cnn_cpu_per_image(args.model, road_images + other_images)
+        pass_rate = 1.0 - (sum(road_reasons.values()) + sum(other_reasons.values())) / n
+        after = prefilter_cpu + pass_rate * cnn_cpu
+        print(f"  CNN CPU           : {cnn_cpu * 1000:.2f} ms / image")
+        print(f"  CPU / request     : {cnn_cpu * 1000:.2f} ms before → {after * 1000:.2f} ms after")
+    print("=" * 50)
+
+    # Road-sample percentiles help pick thresholds that keep the false-reject rate low
+    print("  Road feature percentiles (1% / 50% / 99%):")
+    for name in prefilter.FEATURE_NAMES:
+        values = np.array([f[name] for f in road])
+        p1, p50, p99 = np.percentile(values, [1, 50, 99])
+        print(f"    {name:<13} {p1:10.4f} {p50:10.4f} {p99:10.4f}")
+
+
+if __name__ == "__main__":
+    main()
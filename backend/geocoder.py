@@ -0,0 +1,272 @@
+"""
+Caching proxy in front of Nominatim.
+
+Lookups go through three layers:
+  1. an in-process LRU/TTL cache (repeat lookups never leave memory),
+  2. a SQLite cache shared by every worker and kept across restarts,
+  3. the upstream geocoder, behind a rate limiter that is coordinated
+     through the same SQLite file, so it holds across every worker.
+
+Concurrent identical lookups are coalesced so only one of them reaches
+upstream. At most max_pending lookups per process may be waiting on the
+limiter or upstream at once (keep it below the server's thread count), and
+none waits longer than max_wait; beyond either limit a lookup raises
+RateLimited instead of holding a server thread. The upstream URL
+comes from NOMINATIM_URL, which lets a local fake geocoder stand in during
+testing.
+"""
+import os
+import json
+import math
+import time
+import sqlite3
+import threading
+import unicodedata
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import Future
+
+DEFAULT_UPSTREAM = "https://nominatim.openstreetmap.org"
+REVERSE_PRECISION = 3  # decimal places (~110 m) — matches the admin district cache
+
+
+class RateLimited(Exception):
+    """Upstream queue is full; retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Geocoder busy, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+def normalize_query(query):
+    """Case/whitespace/unicode-insensitive key for forward lookups."""
+    query = unicodedata.normalize("NFKC", query).casefold()
+    return " ".join(query.replace(",", " , ").split()).replace(" ,", ",")
+
+
+def round_coords(lat, lng):
+    return round(float(lat), REVERSE_PRECISION), round(float(lng), REVERSE_PRECISION)
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU with per-entry expiry."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at=None):
+        with self._lock:
+            self._data[key] = (value, expires_at or time.time() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+
+class SQLiteCache:
+    """Persistent key → JSON cache with TTL, shared between processes."""
+
+    def __init__(self, path, ttl, max_rows):
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS geocode_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS geocode_rate (id INTEGER PRIMARY KEY, next_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        """Returns (value, expires_at) or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM geocode_cache WHERE key = ? AND expires_at > ?",
+                (key, time.time())
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO geocode_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at)
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._prune()
+            self._conn.commit()
+        return expires_at
+
+    def reserve_slot(self, interval, max_wait):
+        """
+        Claim the next upstream slot, shared by every process using this file.
+        Returns (claimed, delay): wait `delay` seconds before calling upstream.
+        Nothing is claimed when the delay would exceed max_wait.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT next_at FROM geocode_rate WHERE id = 0").fetchone()
+                now = time.time()
+                next_at = max(now, row[0] if row else 0.0)
+                delay = next_at - now
+                if delay > max_wait:
+                    return False, delay
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO geocode_rate (id, next_at) VALUES (0, ?)",
+                    (next_at + interval,)
+                )
+                return True, delay
+            finally:
+                self._conn.commit()
+
+    def _prune(self):
+        # Drop expired rows, then the soonest-expiring ones beyond max_rows
+        self._conn.execute("DELETE FROM geocode_cache WHERE expires_at <= ?", (time.time(),))
+        self._conn.execute(
+            "DELETE FROM geocode_cache WHERE key IN ("
+            " SELECT key FROM geocode_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_rows,)
+        )
+
+
+class RateLimiter:
+    """Spaces upstream calls at least `interval` seconds apart across all workers."""
+
+    def __init__(self, store, interval, max_wait):
+        self.store = store
+        self.interval = interval
+        self.max_wait = max_wait
+
+    def wait(self):
+        claimed, delay = self.store.reserve_slot(self.interval, self.max_wait)
+        if not claimed:
+            raise RateLimited(math.ceil(delay))
+        if delay > 0:
+            time.sleep(delay)
+
+
+class Geocoder:
+    def __init__(self, upstream=None, cache_path=None, ttl=None, max_entries=None,
+                 min_interval=None, max_wait=None, max_pending=None, user_agent=None, timeout=10):
+        self.upstream = (upstream or os.getenv("NOMINATIM_URL") or DEFAULT_UPSTREAM).rstrip("/")
+        ttl = ttl or float(os.getenv("GEOCODE_CACHE_TTL", 30 * 24 * 3600))
+        max_entries = max_entries or int(os.getenv("GEOCODE_CACHE_SIZE", 10000))
+        cache_path = cache_path or os.getenv(
+            "GEOCODE_CACHE_PATH",
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), "geocode_cache.sqlite3")
+        )
+        if min_interval is None:
+            min_interval = float(os.getenv("GEOCODE_MIN_INTERVAL", 1.0))  # Nominatim policy: 1 req/s
+        if max_wait is None:
+            max_wait = float(os.getenv("GEOCODE_MAX_WAIT", 3.0))
+        if max_pending is None:
+            max_pending = int(os.getenv("GEOCODE_MAX_PENDING", 2))  # gunicorn runs 4 threads
+
+        self.memory = LRUCache(max_entries, ttl)
+        self.store = SQLiteCache(cache_path, ttl, max_rows=max_entries * 10)
+        self.limiter = RateLimiter(self.store, min_interval, max_wait)
+        self.user_agent = user_agent or os.getenv("GEOCODE_USER_AGENT", "RoadGuard/1.0")
+        self.timeout = timeout
+        self.retry_after = max(1, math.ceil(min_interval))
+
+        # Threads allowed to block on the limiter / upstream call at once
+        self._pending = threading.BoundedSemaphore(max_pending)
+
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+    # ── Public API ───────────────────────────────────────────────────────────
+
+    def search(self, query):
+        """Forward geocode. Returns Nominatim's JSON list (best match first)."""
+        key = f"search:{normalize_query(query)}"
+        params = {"q": normalize_query(query), "format": "json", "limit": 1}
+        return self._lookup(key, "/search", params)
+
+    def reverse(self, lat, lng):
+        """Reverse geocode on rounded coordinates. Returns Nominatim's JSON object."""
+        lat, lng = round_coords(lat, lng)
+        key = f"reverse:{lat:.{REVERSE_PRECISION}f},{lng:.{REVERSE_PRECISION}f}"
+        params = {"lat": lat, "lon": lng, "format": "json", "addressdetails": 1}
+        return self._lookup(key, "/reverse", params)
+
+    # ── Internals ────────────────────────────────────────────────────────────
+
+    def _lookup(self, key, path, params):
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+
+        # Coalesce: the first caller for a key does the work, the rest wait on it
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = self._load(key, path, params)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def _load(self, key, path, params):
+        stored = self.store.get(key)
+        if stored is not None:
+            value, expires_at = stored
+            self.memory.set(key, value, expires_at)
+            return value
+
+        if not self._pending.acquire(blocking=False):
+            raise RateLimited(self.retry_after)
+        try:
+            value = self._fetch(path, params)
+        finally:
+            self._pending.release()
+        expires_at = self.store.set(key, value)
+        self.memory.set(key, value, expires_at)
+        return value
+
+    def _fetch(self, path, params):
+        self.limiter.wait()
+        url = f"{self.upstream}{path}?{urllib.parse.urlencode(params)}"
+        req = urllib.request.Request(url, headers={
+            "User-Agent": self.user_agent,
+            "Accept-Language": "en",
+        })
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            return json.loads(resp.read().decode("utf-8"))
@@ -4,4 +4,5 @@ import multiprocessing
 bind = "0.0.0.0:8000"
 workers = 1 # Keep low to save memory on Render Free Tier
 timeout = 300 # Allow enough time for TensorFlow inference on cold starts
-worker_class = "sync"
+worker_class = "gthread"
+threads = 4 # /predict is serialized (predict_lock); at most GEOCODE_MAX_PENDING (2) threads wait on Nominatim
@@ -0,0 +1,175 @@
+"""
+Cheap early-exit cascade that runs before the CNN.
+
+Every check works on a tiny downsample of the upload, so rejecting a
+blurry, dark or clearly non-road image costs a fraction of a millisecond
+instead of a Keras forward pass plus the OpenCV severity pipeline.
+
+Thresholds come from environment variables (PREFILTER_*) and should be
+tuned with calibrate_prefilter.py against a labelled sample. PREFILTER_MODE
+selects what happens with the verdict:
+    off     → not computed
+    shadow  → computed and logged only (default until thresholds are calibrated)
+    enforce → rejected images never reach the CNN
+"""
+import os
+import json
+
+import cv2
+import numpy as np
+from PIL import Image
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_SIZE = 64
+MODES = ("off", "shadow", "enforce")
+
+FEATURE_NAMES = (
+    "blur_var",        # Laplacian variance — low = blurry
+    "brightness",      # mean luma 0..1
+    "dark_frac",       # share of near-black pixels
+    "bright_frac",     # share of blown-out pixels
+    "saturation",      # mean HSV saturation 0..1 — asphalt is mostly grey
+    "skin_frac",       # share of skin-tone pixels — selfies / faces
+    "edge_density",    # share of Canny edge pixels — texture
+)
+
+
+def _env_float(name, default):
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+
+def load_config():
+    """
+    Read cascade settings from the environment.
+    Thresholds set to None are skipped. The skin-tone and saturation rules are
+    off unless configured: they also match mud, dirt and water-filled potholes.
+    """
+    mode = os.getenv("PREFILTER_MODE", "shadow").lower()
+    if mode not in MODES:
+        raise ValueError(f"PREFILTER_MODE must be one of {MODES}, got {mode!r}")
+
+    config = {
+        "mode":           mode,
+        "min_blur_var":   _env_float("PREFILTER_MIN_BLUR_VAR", 15.0),
+        "min_brightness": _env_float("PREFILTER_MIN_BRIGHTNESS", 0.08),
+        "max_brightness": _env_float("PREFILTER_MAX_BRIGHTNESS", 0.95),
+        "max_dark_frac":  _env_float("PREFILTER_MAX_DARK_FRAC", 0.85),
+        "max_bright_frac": _env_float("PREFILTER_MAX_BRIGHT_FRAC", 0.70),
+        "max_skin_frac":  _env_float("PREFILTER_MAX_SKIN_FRAC", None),
+        "max_saturation": _env_float("PREFILTER_MAX_SATURATION", None),
+        "min_edge_density": _env_float("PREFILTER_MIN_EDGE_DENSITY", 0.01),
+        "classifier":     None,
+        "reject_below":   _env_float("PREFILTER_REJECT_BELOW", 0.05),
+    }
+
+    # Optional linear classifier written by calibrate_prefilter.py --fit.
+    # Relative paths are resolved against backend/, not the working directory.
+    weights_path = os.getenv("PREFILTER_WEIGHTS")
+    if weights_path:
+        weights_path = os.path.join(BASE_DIR, weights_path)
+        if not os.path.exists(weights_path):
+            raise FileNotFoundError(f"PREFILTER_WEIGHTS not found: {weights_path}")
+        with open(weights_path) as f:
+            config["classifier"] = _check_classifier(json.load(f), weights_path)
+
+    return config
+
+
+def _check_classifier(classifier, path):
+    """Fail at startup rather than score the wrong features per request."""
+    if classifier.get("features") != list(FEATURE_NAMES):
+        raise ValueError(
+            f"{path} was fitted on features {classifier.get('features')}, "
+            f"expected {list(FEATURE_NAMES)} — re-run calibrate_prefilter.py --fit"
+        )
+    for key in ("mean", "std", "weights"):
+        if len(classifier.get(key) or []) != len(FEATURE_NAMES):
+            raise ValueError(f"{path}: '{key}' must have {len(FEATURE_NAMES)} values")
+    if "bias" not in classifier:
+        raise ValueError(f"{path}: missing 'bias'")
+    return classifier
+
+
+def extract_features(img):
+    """
+    Compute cascade features from a PIL RGB image.
+    Returns a dict keyed by FEATURE_NAMES.
+    """
+    small = img.convert("RGB").resize((SAMPLE_SIZE, SAMPLE_SIZE), Image.BILINEAR, reducing_gap=2.0)
+    rgb = np.asarray(small, dtype=np.uint8)
+
+    gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+    hsv = cv2.cvtColor(rgb, cv2.COLOR_RGB2HSV)
+    ycrcb = cv2.cvtColor(rgb, cv2.COLOR_RGB2YCrCb)
+
+    blur_var = cv2.Laplacian(gray, cv2.CV_64F).var()
+
+    # Classic YCrCb skin-tone box
+    cr, cb = ycrcb[..., 1], ycrcb[..., 2]
+    skin = (cr >= 135) & (cr <= 173) & (cb >= 77) & (cb <= 127)
+
+    edges = cv2.Canny(gray, 50, 150)
+
+    return {
+        "blur_var":     float(blur_var),
+        "brightness":   float(gray.mean() / 255.0),
+        "dark_frac":    float((gray < 20).mean()),
+        "bright_frac":  float((gray > 245).mean()),
+        "saturation":   float(hsv[..., 1].mean() / 255.0),
+        "skin_frac":    float(skin.mean()),
+        "edge_density": float((edges > 0).mean()),
+    }
+
+
+def classifier_score(features, classifier):
+    """Logistic score (probability the image is road surface)."""
+    x = np.array([features[name] for name in FEATURE_NAMES], dtype=np.float64)
+    x = (x - np.array(classifier["mean"])) / np.array(classifier["std"])
+    z = float(np.dot(x, classifier["weights"]) + classifier["bias"])
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+def _below(value, threshold):
+    return threshold is not None and value < threshold
+
+
+def _above(value, threshold):
+    return threshold is not None and value > threshold
+
+
+def evaluate(features, config):
+    """
+    Run the cascade on precomputed features.
+    Returns (reject: bool, reason: str | None).
+    """
+    if _below(features["blur_var"], config["min_blur_var"]):
+        return True, "blurry"
+    if _below(features["brightness"], config["min_brightness"]) or _above(features["dark_frac"], config["max_dark_frac"]):
+        return True, "too_dark"
+    if _above(features["brightness"], config["max_brightness"]) or _above(features["bright_frac"], config["max_bright_frac"]):
+        return True, "overexposed"
+    if _above(features["skin_frac"], config["max_skin_frac"]):
+        return True, "skin"
+    if _above(features["saturation"], config["max_saturation"]):
+        return True, "too_colourful"
+    if _below(features["edge_density"], config["min_edge_density"]):
+        return True, "no_texture"
+
+    if config["classifier"] is not None:
+        if classifier_score(features, config["classifier"]) < config["reject_below"]:
+            return True, "classifier"
+
+    return False, None
+
+
+def check_image(img, config):
+    """
+    Returns (reject, reason, features) for a PIL image. `reject` is only ever
+    True in enforce mode; in shadow mode the would-be reason is still returned.
+    """
+    if config["mode"] == "off":
+        return False, None, None
+    features = extract_features(img)
+    reject, reason = evaluate(features, config)
+    return reject and config["mode"] == "enforce", reason, features
@@ -0,0 +1,134 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from geocoder import Geocoder, RateLimited
+
+
+class FakeNominatim(BaseHTTPRequestHandler):
+    """Answers /search and /reverse slowly and records every hit."""
+    hits = []
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with self.lock:
+            self.hits.append((time.time(), self.path))
+        time.sleep(0.2)
+        if self.path.startswith("/search"):
+            body = [{"lat": "9.98", "lon": "76.28", "display_name": "Kochi, Kerala"}]
+        else:
+            body = {"address": {"county": "Ernakulam"}}
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def upstream():
+    FakeNominatim.hits = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeNominatim)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "geocode.sqlite3")
+
+
+def test_concurrent_identical_lookups_are_coalesced(upstream, cache_path):
+    geocoder = Geocoder(upstream=upstream, cache_path=cache_path, min_interval=0)
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: geocoder.search("Kochi"), range(8)))
+
+    assert len(FakeNominatim.hits) == 1
+    assert all(r == results[0] for r in results)
+
+
+def test_repeat_and_normalized_lookups_hit_the_cache(upstream, cache_path):
+    geocoder = Geocoder(upstream=upstream, cache_path=cache_path, min_interval=0)
+    first = geocoder.search("Kochi, Kerala")
+    assert geocoder.search("  kochi ,KERALA ") == first
+    # Reverse keys are rounded to ~110 m
+    geocoder.reverse(9.93121, 76.26731)
+    geocoder.reverse(9.93140, 76.26720)
+
+    assert len(FakeNominatim.hits) == 2
+
+
+def test_upstream_calls_are_spaced(upstream, cache_path):
+    geocoder = Geocoder(upstream=upstream, cache_path=cache_path, min_interval=0.3, max_pending=3)
+    with ThreadPoolExecutor(3) as pool:
+        list(pool.map(geocoder.search, ["Kochi", "Thrissur", "Kollam"]))
+
+    times = sorted(t for t, _ in FakeNominatim.hits)
+    assert len(times) == 3
+    assert all(b - a >= 0.28 for a, b in zip(times, times[1:]))
+
+
+def test_long_queue_raises_rate_limited(upstream, cache_path):
+    geocoder = Geocoder(upstream=upstream, cache_path=cache_path, min_interval=2, max_wait=0.5)
+    geocoder.search("Kochi")
+    with pytest.raises(RateLimited) as exc:
+        geocoder.search("Thrissur")
+
+    assert exc.value.retry_after >= 1
+    assert len(FakeNominatim.hits) == 1
+
+
+def test_uncached_burst_blocks_at_most_max_pending_threads(upstream, cache_path):
+    geocoder = Geocoder(upstream=upstream, cache_path=cache_path, min_interval=0.3, max_wait=10, max_pending=2)
+
+    # Track how many threads are inside the limiter + upstream call at once
+    fetch = geocoder._fetch
+    lock = threading.Lock()
+    active, peak = [0], [0]
+
+    def counting_fetch(path, params):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        try:
+            return fetch(path, params)
+        finally:
+            with lock:
+                active[0] -= 1
+
+    geocoder._fetch = counting_fetch
+
+    def lookup(i):
+        try:
+            geocoder.reverse(9.9 + i / 100, 76.2)
+            return "ok"
+        except RateLimited as e:
+            assert e.retry_after >= 1
+            return "limited"
+
+    with ThreadPoolExecutor(6) as pool:
+        outcomes = list(pool.map(lookup, range(6)))
+
+    assert peak[0] <= 2
+    assert outcomes.count("ok") == len(FakeNominatim.hits) <= 2
+    assert outcomes.count("limited") >= 4
+
+
+def test_cache_and_limiter_persist_across_instances(upstream, cache_path):
+    Geocoder(upstream=upstream, cache_path=cache_path, min_interval=2, max_wait=0.5).search("Kochi")
+
+    other = Geocoder(upstream=upstream, cache_path=cache_path, min_interval=2, max_wait=0.5)
+    assert other.search("kochi")[0]["display_name"] == "Kochi, Kerala"
+    # The slot claimed by the first instance is shared through the file
+    with pytest.raises(RateLimited):
+        other.search("Thrissur")
+    assert len(FakeNominatim.hits) == 1
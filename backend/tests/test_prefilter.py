@@ -0,0 +1,132 @@
+import json
+
+import pytest
+from PIL import Image
+
+import prefilter
+
+# Features of a sharp, evenly lit grey road photo (close to backend/m3.jpg)
+ROAD = {
+    "blur_var": 350.0,
+    "brightness": 0.47,
+    "dark_frac": 0.0,
+    "bright_frac": 0.0,
+    "saturation": 0.04,
+    "skin_frac": 0.0,
+    "edge_density": 0.11,
+}
+
+
+@pytest.fixture
+def config(monkeypatch):
+    for name in ("PREFILTER_MODE", "PREFILTER_WEIGHTS", "PREFILTER_MAX_SKIN_FRAC", "PREFILTER_MAX_SATURATION"):
+        monkeypatch.delenv(name, raising=False)
+    return prefilter.load_config()
+
+
+def with_features(**overrides):
+    return {**ROAD, **overrides}
+
+
+def test_road_passes(config):
+    assert prefilter.evaluate(ROAD, config) == (False, None)
+
+
+@pytest.mark.parametrize("overrides, reason", [
+    ({"blur_var": 5.0}, "blurry"),
+    ({"brightness": 0.03}, "too_dark"),
+    ({"dark_frac": 0.9}, "too_dark"),
+    ({"brightness": 0.97}, "overexposed"),
+    ({"bright_frac": 0.8}, "overexposed"),
+    ({"edge_density": 0.001}, "no_texture"),
+])
+def test_default_rules(config, overrides, reason):
+    assert prefilter.evaluate(with_features(**overrides), config) == (True, reason)
+
+
+def test_skin_and_saturation_off_by_default(config):
+    # Muddy brown road: fully inside the skin-tone box and fairly saturated
+    muddy = with_features(skin_frac=1.0, saturation=0.7)
+    assert prefilter.evaluate(muddy, config) == (False, None)
+
+
+def test_skin_and_saturation_when_configured(config):
+    config.update(max_skin_frac=0.45, max_saturation=0.6)
+    assert prefilter.evaluate(with_features(skin_frac=0.5), config) == (True, "skin")
+    assert prefilter.evaluate(with_features(saturation=0.7), config) == (True, "too_colourful")
+
+
+def test_classifier_rule(config):
+    config["classifier"] = {
+        "mean": [0.0] * len(prefilter.FEATURE_NAMES),
+        "std": [1.0] * len(prefilter.FEATURE_NAMES),
+        "weights": [0.0] * len(prefilter.FEATURE_NAMES),
+        "bias": -10.0,
+    }
+    assert prefilter.evaluate(ROAD, config) == (True, "classifier")
+
+
+def test_shadow_mode_is_default_and_never_rejects(config):
+    assert config["mode"] == "shadow"
+    dark = Image.new("RGB", (200, 200), (5, 5, 5))
+    rejected, reason, features = prefilter.check_image(dark, config)
+    assert not rejected
+    assert reason == "blurry"
+    assert features is not None
+
+
+def test_enforce_mode_rejects(config):
+    config["mode"] = "enforce"
+    dark = Image.new("RGB", (200, 200), (5, 5, 5))
+    assert prefilter.check_image(dark, config)[:2] == (True, "blurry")
+
+
+def test_off_mode_skips_features(config):
+    config["mode"] = "off"
+    dark = Image.new("RGB", (200, 200), (5, 5, 5))
+    assert prefilter.check_image(dark, config) == (False, None, None)
+
+
+def test_missing_weights_file_raises(monkeypatch):
+    monkeypatch.setenv("PREFILTER_WEIGHTS", "does_not_exist.json")
+    with pytest.raises(FileNotFoundError):
+        prefilter.load_config()
+
+
+def weights(**overrides):
+    n = len(prefilter.FEATURE_NAMES)
+    return {
+        "features": list(prefilter.FEATURE_NAMES),
+        "mean": [0.0] * n,
+        "std": [1.0] * n,
+        "weights": [0.0] * n,
+        "bias": 0.0,
+        **overrides,
+    }
+
+
+def test_weights_file_is_loaded(monkeypatch, tmp_path):
+    path = tmp_path / "weights.json"
+    path.write_text(json.dumps(weights()))
+    monkeypatch.setenv("PREFILTER_WEIGHTS", str(path))
+    assert prefilter.load_config()["classifier"]["bias"] == 0.0
+
+
+@pytest.mark.parametrize("overrides", [
+    {"features": list(reversed(prefilter.FEATURE_NAMES))},
+    {"features": list(prefilter.FEATURE_NAMES) + ["hue"]},
+    {"weights": [0.0] * (len(prefilter.FEATURE_NAMES) - 1)},
+    {"mean": []},
+])
+def test_mismatched_weights_file_raises(monkeypatch, tmp_path, overrides):
+    path = tmp_path / "weights.json"
+    path.write_text(json.dumps(weights(**overrides)))
+    monkeypatch.setenv("PREFILTER_WEIGHTS", str(path))
+    with pytest.raises(ValueError):
+        prefilter.load_config()
+
+
+def test_invalid_mode_raises(monkeypatch):
+    monkeypatch.setenv("PREFILTER_MODE", "sometimes")
+    with pytest.raises(ValueError):
+        prefilter.load_config()
@@ -1,8 +1,7 @@
 import { createNavbar } from '../components/navbar.js';
 import { supabase } from '../services/supabaseClient.js';
 import { showAlert } from '../components/alert.js';
-
-const NOMINATIM_URL = 'https://nominatim.openstreetmap.org';
+import { fetchGeocode } from '../services/geocodeClient.js';
 
 const KERALA_DISTRICTS = [
   'All Districts', 'Thiruvananthapuram', 'Kollam', 'Pathanamthitta',
@@ -17,11 +16,8 @@ async function getDistrict(lat, lng) {
   const key = `${lat.toFixed(3)},${lng.toFixed(3)}`;
   if (districtCache.has(key)) return districtCache.get(key);
   try {
-    const resp = await fetch(
-      `${NOMINATIM_URL}/reverse?lat=${lat}&lon=${lng}&format=json&addressdetails=1`,
-      { headers: { 'Accept-Language': 'en' } }
-    );
-    const data = await resp.json();
+    // Backend proxies Nominatim with a shared cache and a global rate limit
+    const data = await fetchGeocode(`/geocode/reverse?lat=${lat}&lng=${lng}`);
     // Nominatim returns district in county or state_district for Kerala
     const district = data.address?.county
       || data.address?.state_district
@@ -184,16 +180,13 @@ async function loadAllData() {
 }
 
 async function enrichWithDistricts(potholes) {
-  // Process in batches of 5, with 300ms delay between batches to respect Nominatim rate limits
+  // Process in batches of 5 — the backend geocode proxy handles Nominatim rate limits
   const BATCH = 5;
   for (let i = 0; i < potholes.length; i += BATCH) {
     const batch = potholes.slice(i, i + BATCH);
     await Promise.all(batch.map(async p => {
       p.district = await getDistrict(p.latitude, p.longitude);
     }));
-    if (i + BATCH < potholes.length) {
-      await new Promise(r => setTimeout(r, 300));
-    }
   }
 }
 
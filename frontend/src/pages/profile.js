@@ -230,7 +230,7 @@ function showReportModal(pothole, index) {
       border-radius:50%;cursor:pointer;font-size:0.85rem;min-height:auto;
     ">×</button>
     <h2 style="margin:0 0 1.25rem;font-size:1.1rem;">Report #${index + 1}</h2>
-    ${pothole.image_url ? `<img src="${pothole.image_url}" style="width:100%;border-radius:var(--radius-m);margin-bottom:1.25rem;max-height:200px;object-fit:cover;">` : ''}
+    ${pothole.image_url ? `<img src="${pothole.image_variants?.['320']?.webp || pothole.image_url}" onerror="this.onerror=null;this.src='${pothole.image_url}'" style="width:100%;border-radius:var(--radius-m);margin-bottom:1.25rem;max-height:200px;object-fit:cover;">` : ''}
     <div class="modal-grid">
       <div style="background:var(--bg-raised);border-radius:var(--radius-m);padding:0.75rem;">
         <div style="font-size:0.7rem;color:var(--text-tertiary);text-transform:uppercase;margin-bottom:0.15rem;">Status</div>
@@ -4,9 +4,9 @@ import { showAlert } from '../components/alert.js';
 import { routeStore } from '../services/routeStore.js';
 import { router } from '../router.js';
 import { BACKEND_URL } from '../services/apiConfig.js';
+import { fetchGeocode } from '../services/geocodeClient.js';
 
 const OSRM_URL = 'https://router.project-osrm.org';
-const NOMINATIM_URL = 'https://nominatim.openstreetmap.org';
 
 // Module-level state
 let routeMap = null;
@@ -352,13 +352,9 @@ async function geocode(input) {
     return { lat: parseFloat(coordMatch[1]), lng: parseFloat(coordMatch[2]), label: input };
   }
 
-  // Otherwise use Nominatim geocoding
+  // Otherwise use Nominatim geocoding via the caching backend proxy
   try {
-    const resp = await fetch(
-      `${NOMINATIM_URL}/search?q=${encodeURIComponent(input)}&format=json&limit=1`,
-      { headers: { 'Accept-Language': 'en' } }
-    );
-    const data = await resp.json();
+    const data = await fetchGeocode(`/geocode?q=${encodeURIComponent(input)}`);
     if (data && data.length > 0) {
       return {
         lat: parseFloat(data[0].lat),
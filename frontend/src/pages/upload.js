@@ -294,6 +294,17 @@ async function handleUpload(e) {
     clearTimeout(timeoutId);
 
     const data = await res.json();
+    if (res.status === 422 && data.prefilter) {
+      // Rejected by the backend pre-filter before the model ran
+      const hints = {
+        blurry: 'The photo looks blurry.',
+        too_dark: 'The photo is too dark.',
+        overexposed: 'The photo is overexposed.',
+      };
+      showAlert(`${hints[data.prefilter] || 'This does not look like a road surface.'} Please retake the photo of the road.`, 'info');
+      btn.textContent = 'Submit Report'; btn.disabled = false; btn.style.opacity = '1';
+      return;
+    }
     if (!res.ok) throw new Error(data.error || 'Prediction failed');
 
     showAlert(`${data.result} (${(data.confidence * 100).toFixed(1)}% confidence)`, data.result === 'Pothole' ? 'success' : 'info');
@@ -0,0 +1,20 @@
+/**
+ * Calls the backend geocoding proxy. When the proxy's upstream queue is full
+ * it answers 503 with Retry-After; we wait that long and try again.
+ */
+import { BACKEND_URL } from './apiConfig.js';
+
+const MAX_ATTEMPTS = 4;
+
+export async function fetchGeocode(path) {
+  for (let attempt = 1; ; attempt++) {
+    const resp = await fetch(`${BACKEND_URL}${path}`);
+    if (resp.status === 503 && attempt < MAX_ATTEMPTS) {
+      const retryAfter = parseFloat(resp.headers.get('Retry-After')) || 1;
+      await new Promise(r => setTimeout(r, retryAfter * 1000));
+      continue;
+    }
+    if (!resp.ok) throw new Error(`Geocode failed (${resp.status})`);
+    return resp.json();
+  }
+}